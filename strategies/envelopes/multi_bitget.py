@@ -5,6 +5,7 @@ import ta
 
 sys.path.append("./robot-tradingV2-main")
 from utilities.bitget_perp import PerpBitget
+from utilities.risk_limits import apply_risk_limits
 from secret import ACCOUNTS
 
 if sys.platform == "win32":
@@ -42,6 +43,13 @@ async def main():
     tf = "1h"
     size_leverage = 4
     sl_pct = 0.2
+    # Risk caps. Designed sizing (10 pairs x 0.1 size x 4 size_leverage) is
+    # 0.4x balance notional per pair, 4.0x in total, i.e. 1.0x balance of margin
+    # at exchange_leverage 4. Margin is capped at 95% of the free balance to
+    # leave room for fees, so a flat account gets its order set scaled ~5% down.
+    max_pair_exposure = 0.5   # max notional per pair, x total balance (25% above design)
+    max_total_exposure = 4    # max notional on all pairs, x total balance
+    max_margin_usage = 0.95   # max margin of new orders, x free balance
 
     # Strategy parameters per pair
     params = {
@@ -165,7 +173,8 @@ async def main():
                 df[f'ma_low_{i}'] = df['ma_base']*(1-env)
 
         # Balance and cancel orders
-        usdt_balance = (await exchange.get_balance()).total
+        balance = await exchange.get_balance()
+        usdt_balance = balance.total
         print(f"Balance: {usdt_balance:.2f} USDT")
 
         # Cancel existing trigger and limit orders
@@ -182,7 +191,7 @@ async def main():
         # Get positions
         print("Getting live positions...")
         positions = await exchange.get_open_positions(pairs)
-        tasks_close, tasks_open = [], []
+        tasks_close, orders_open = [], []
         # Close existing positions and set SL
         for pos in positions:
             pair = pos.pair
@@ -217,15 +226,10 @@ async def main():
                     raw_price = prev[price_key]
                     raw_trigger = raw_price * (1.005 if side=='buy' else 0.995)
                     raw_size = (params[pair]['size']*usdt_balance/len(params[pair]['envelopes'])*size_leverage)/raw_price
-                    size2 = round_size(exchange, pair, raw_size, markets_info[pair])
-                    if size2:
-                        tasks_open.append(exchange.place_trigger_order(
-                            pair=pair, side=side,
-                            price=round_price(exchange, pair, raw_price),
-                            trigger_price=round_price(exchange, pair, raw_trigger),
-                            size=size2, type='limit', reduce=False,
-                            margin_mode=margin_mode, error=False
-                        ))
+                    orders_open.append({
+                        'pair': pair, 'side': side, 'price': raw_price,
+                        'trigger_price': raw_trigger, 'size': raw_size,
+                    })
 
         print(f"Placing {len(tasks_close)} close SL/limit orders...")
         await asyncio.gather(*tasks_close)
@@ -241,15 +245,35 @@ async def main():
                     raw_price = prev[f"{key}{i}"]
                     raw_trigger = raw_price*(1.005 if side=='long' else 0.995)
                     raw_size = (params[pair]['size']*usdt_balance/len(params[pair]['envelopes'])*size_leverage)/raw_price
-                    size2 = round_size(exchange, pair, raw_size, markets_info[pair])
-                    if not size2: continue
-                    tasks_open.append(exchange.place_trigger_order(
-                        pair=pair, side=('buy' if side=='long' else 'sell'),
-                        price=round_price(exchange, pair, raw_price),
-                        trigger_price=round_price(exchange, pair, raw_trigger),
-                        size=size2, type='limit', reduce=False,
-                        margin_mode=margin_mode, error=False
-                    ))
+                    orders_open.append({
+                        'pair': pair, 'side': ('buy' if side=='long' else 'sell'),
+                        'price': raw_price, 'trigger_price': raw_trigger, 'size': raw_size,
+                    })
+
+        # Check margin and exposure on the whole order set before sending
+        orders_open, risk = apply_risk_limits(
+            orders_open, positions, usdt_balance, balance.free, exchange_leverage, markets_info,
+            max_pair_exposure, max_total_exposure, max_margin_usage,
+        )
+        print(
+            f"Risk check: {risk['requested']} orders, {risk['invalid']} invalid, "
+            f"{risk['scaled']} scaled, {risk['pruned']} pruned, "
+            f"{risk['over_cap']} over caps, {risk['rejected']} would be rejected, "
+            f"{risk['calls_saved']} calls saved - "
+            f"notional {risk['notional']:.2f} / {max_total_exposure*usdt_balance:.2f}, "
+            f"margin {risk['margin']:.2f} / {max_margin_usage*balance.free:.2f} USDT"
+        )
+        tasks_open = []
+        for o in orders_open:
+            size2 = round_size(exchange, o['pair'], o['size'], markets_info[o['pair']])
+            if not size2: continue
+            tasks_open.append(exchange.place_trigger_order(
+                pair=o['pair'], side=o['side'],
+                price=round_price(exchange, o['pair'], o['price']),
+                trigger_price=round_price(exchange, o['pair'], o['trigger_price']),
+                size=size2, type='limit', reduce=False,
+                margin_mode=margin_mode, error=False
+            ))
 
         print(f"Placing {len(tasks_open)} open limit orders...")
         await asyncio.gather(*tasks_open)
@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utilities.risk_limits import apply_risk_limits, floor_to_step
+
+CAPS = dict(max_pair_exposure=0.5, max_total_exposure=4, max_margin_usage=0.95)
+
+
+def order(pair, price, size):
+    return {'pair': pair, 'side': 'buy', 'price': price, 'trigger_price': price, 'size': size}
+
+
+def position(pair, usd_size):
+    return SimpleNamespace(pair=pair, usd_size=usd_size)
+
+
+def info(*pairs, min_amount=0.001, step=0.001):
+    return {p: {'min_amount': min_amount, 'amount_precision': step} for p in pairs}
+
+
+def designed_orders(balance, pairs):
+    # 0.1 size x 4 size_leverage split over 2 envelopes, as in multi_bitget.py
+    return [order(p, 2.0, 0.1 * balance / 2 * 4 / 2.0) for p in pairs for _ in range(2)]
+
+
+def test_empty_orders():
+    kept, report = apply_risk_limits([], [], 1000, 1000, 4, {}, **CAPS)
+    assert kept == []
+    assert report['requested'] == 0
+    assert report['calls_saved'] == 0
+
+
+def test_designed_sizing_fits_with_free_margin_headroom():
+    pairs = [f"P{i}/USDT" for i in range(10)]
+    orders = designed_orders(1000, pairs)
+    kept, report = apply_risk_limits(orders, [], 1000, 1200, 4, info(*pairs), **CAPS)
+    assert len(kept) == 20
+    assert [o['size'] for o in kept] == [o['size'] for o in orders]
+    assert report['scaled'] == 0
+    assert report['calls_saved'] == 0
+
+
+def test_designed_sizing_scaled_to_free_margin():
+    pairs = [f"P{i}/USDT" for i in range(10)]
+    kept, report = apply_risk_limits(
+        designed_orders(1000, pairs), [], 1000, 900, 4, info(*pairs), **CAPS
+    )
+    assert report['scaled'] == 20
+    assert report['margin'] <= 0.95 * 900
+    # Last 2 orders in list order would have run out of free margin
+    assert report['rejected'] == 2
+    assert report['calls_saved'] == 2
+
+
+def test_position_without_orders_uses_total_exposure():
+    kept, report = apply_risk_limits(
+        [order('A/USDT', 1.0, 400)], [position('B/USDT', 3800)],
+        1000, 1000, 4, info('A/USDT'), **CAPS
+    )
+    assert kept[0]['size'] == 200
+    assert report['notional'] == 4000
+
+
+def test_pair_with_no_headroom_is_pruned():
+    kept, report = apply_risk_limits(
+        [order('A/USDT', 1.0, 100), order('B/USDT', 1.0, 100)], [position('A/USDT', 600)],
+        1000, 1000, 4, info('A/USDT', 'B/USDT'), **CAPS
+    )
+    assert [o['pair'] for o in kept] == ['B/USDT']
+    assert report['pruned'] == 1
+    assert report['calls_saved'] == 1
+
+
+def test_invalid_orders_do_not_disable_caps():
+    orders = [order('A/USDT', float('nan'), 10), order('A/USDT', 1.0, -5), order('A/USDT', 1.0, 1000)]
+    kept, report = apply_risk_limits(orders, [], 1000, 1000, 4, info('A/USDT'), **CAPS)
+    assert report['invalid'] == 2
+    assert report['pruned'] == 0
+    assert kept[0]['size'] == 500
+
+
+def test_below_minimum_after_precision_is_not_a_saved_call():
+    orders = [order('A/USDT', 1.0, 1.9), order('A/USDT', 1.0, 0.5)]
+    kept, report = apply_risk_limits(orders, [], 1000, 1000, 4, info('A/USDT', min_amount=1, step=1), **CAPS)
+    assert [o['size'] for o in kept] == [1.0]
+    assert report['pruned'] == 1
+    assert report['calls_saved'] == 0
+
+
+def test_floor_to_step():
+    assert floor_to_step(0.3, 0.1) == pytest.approx(0.3)
+    assert floor_to_step(1.99, 1) == 1
+    assert floor_to_step(1.99, float('nan')) == 1.99
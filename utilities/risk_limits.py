@@ -0,0 +1,108 @@
+import numpy as np
+
+
+def floor_to_step(amount, step):
+    """
+    Truncate amount to the exchange amount step, like amount_to_precision does.
+    step is the ccxt tick size, NaN means no truncation.
+    """
+    step = np.asarray(step, dtype=float)
+    safe_step = np.where(np.isfinite(step) & (step > 0), step, 1.0)
+    # Small epsilon so 0.3 / 0.1 doesn't floor to 2
+    floored = np.floor(amount / safe_step + 1e-9) * safe_step
+    return np.where(np.isfinite(step) & (step > 0), floored, amount)
+
+
+def apply_risk_limits(orders, positions, balance, free_balance, leverage, markets_info,
+                      max_pair_exposure, max_total_exposure, max_margin_usage):
+    """
+    Scale or prune the full set of opening orders before anything is sent.
+
+    If every order fills, notional must stay under the per-pair and total
+    exposure caps (multiples of the total balance, live positions included) and
+    the margin of the new orders under max_margin_usage * free_balance, which is
+    what the exchange checks orders against.
+    Orders are scaled proportionally, truncated to the amount step and pruned if
+    below the pair's minimum.
+
+    Report counts:
+    - invalid: orders with a non-finite or non-positive price or size, dropped
+    - scaled / pruned: orders cut down / removed by this stage
+    - over_cap: orders the old path would have sent that hit a cap
+    - rejected: orders the old path would have sent beyond the free margin,
+      taken in list order, which the exchange would have refused
+    - calls_saved: calls of the old path not made anymore or not refused anymore
+    Returns (kept orders, report dict).
+    """
+    report = {
+        'requested': len(orders), 'invalid': 0, 'scaled': 0, 'pruned': 0,
+        'over_cap': 0, 'rejected': 0, 'calls_saved': 0,
+        'margin': 0.0, 'notional': 0.0,
+    }
+
+    # Drop orders with a bad price or size so they can't break the sums below
+    valid = [
+        o for o in orders
+        if np.isfinite(o['price']) and np.isfinite(o['size'])
+        and o['price'] > 0 and o['size'] > 0
+    ]
+    report['invalid'] = len(orders) - len(valid)
+    orders = valid
+
+    pairs = sorted({o['pair'] for o in orders} | {pos.pair for pos in positions})
+    pair_idx = {pair: i for i, pair in enumerate(pairs)}
+    idx = np.array([pair_idx[o['pair']] for o in orders], dtype=int)
+    price = np.array([o['price'] for o in orders], dtype=float)
+    size = np.array([o['size'] for o in orders], dtype=float)
+    min_amount = np.array([markets_info[o['pair']]['min_amount'] for o in orders], dtype=float)
+    step = np.array(
+        [markets_info[o['pair']].get('amount_precision') or np.nan for o in orders],
+        dtype=float,
+    )
+    notional = size * price
+
+    # Worst case: live positions stay open and every order fills
+    pos_idx = np.array([pair_idx[pos.pair] for pos in positions], dtype=int)
+    pos_notional = np.array([pos.usd_size for pos in positions], dtype=float)
+    live_notional = np.bincount(pos_idx, weights=pos_notional, minlength=len(pairs))
+
+    # Per pair cap
+    pair_headroom = np.clip(max_pair_exposure * balance - live_notional, 0, None)
+    pair_wanted = np.bincount(idx, weights=notional, minlength=len(pairs))
+    pair_scale = np.ones(len(pairs))
+    np.divide(pair_headroom, pair_wanted, out=pair_scale, where=pair_wanted > pair_headroom)
+
+    # Total exposure and margin caps
+    total_headroom = max(min(
+        max_total_exposure * balance - live_notional.sum(),
+        max_margin_usage * free_balance * leverage,
+    ), 0.0)
+    total_wanted = (notional * pair_scale[idx]).sum()
+    total_scale = 1.0
+    if total_wanted > total_headroom:
+        total_scale = total_headroom / total_wanted
+
+    scale = pair_scale[idx] * total_scale
+    new_size = floor_to_step(size * scale, step)
+    new_notional = new_size * price
+    keep = (new_size > 0) & (new_size >= min_amount)
+
+    # What the old path would have sent, i.e. not skipped by round_size,
+    # and which of those the exchange would have refused for lack of margin
+    old_size = floor_to_step(size, step)
+    would_send = (old_size > 0) & (old_size >= min_amount)
+    old_margin = np.cumsum(np.where(would_send, old_size * price, 0.0)) / leverage
+    rejected = would_send & (old_margin > free_balance)
+
+    report['scaled'] = int((keep & (scale < 1)).sum())
+    report['pruned'] = int((~keep).sum())
+    report['over_cap'] = int((would_send & (scale < 1)).sum())
+    report['rejected'] = int(rejected.sum())
+    report['calls_saved'] = int((would_send & (~keep | rejected)).sum())
+    report['margin'] = round(float(new_notional[keep].sum() / leverage), 2)
+    report['notional'] = round(float(live_notional.sum() + new_notional[keep].sum()), 2)
+    kept = [
+        {**o, 'size': float(s)}
+        for o, s, k in zip(orders, new_size, keep) if k
+    ]
+    return kept, report